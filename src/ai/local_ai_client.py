@@ -5,13 +5,40 @@ This module provides a client for interacting with a local AI server
 that implements the OpenAI API-compatible interface.
 """
 
+import hashlib
 import json
 import logging
 import requests
-from typing import Dict, List, Optional, Union, Any
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Union, Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
 
 logger = logging.getLogger(__name__)
 
+
+def _dumps(data: Any) -> bytes:
+    """Serialize a request payload to JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data).encode("utf-8")
+
+
+def _loads(content: bytes) -> Any:
+    """Deserialize a JSON response body."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+class SegmentCachingUnsupportedError(Exception):
+    """Exception raised when the server does not support position-independent caching."""
+    pass
+
+
 class LocalAIClient:
     """
     Client for interacting with a local AI server.
@@ -21,12 +48,14 @@ class LocalAIClient:
     or other local inference servers.
     """
     
-    def __init__(self, base_url: str = "http://127.0.0.1:1234"):
+    def __init__(self, base_url: str = "http://127.0.0.1:1234", max_cached_slots: int = 1):
         """
         Initialize the LocalAIClient.
         
         Args:
             base_url: The base URL of the local AI server.
+            max_cached_slots: The number of parallel slots the server has
+                (llama.cpp's --parallel). Slot ids beyond it are rejected by the server.
         """
         self.base_url = base_url
         self.completions_url = f"{base_url}/v1/completions"
@@ -34,11 +63,23 @@ class LocalAIClient:
         self.embeddings_url = f"{base_url}/v1/embeddings"
         self.models_url = f"{base_url}/v1/models"
         self.health_url = f"{base_url}/health"
+        self.segments_url = f"{base_url}/v1/segments"
         
         # Default headers for API requests
         self.headers = {
             "Content-Type": "application/json"
         }
+        
+        # Shared session so that requests reuse pooled keep-alive connections
+        self.session = requests.Session()
+        
+        # Keys of segments whose KV cache has been compiled on the server
+        self.compiled_segments: Set[str] = set()
+        
+        # Server slots holding the KV cache of recently used prompt prefixes,
+        # keyed by prefix hash in least recently used order
+        self.max_cached_slots = max(1, max_cached_slots)
+        self.prefix_slots: "OrderedDict[str, int]" = OrderedDict()
     
     def is_server_running(self) -> bool:
         """
@@ -48,10 +89,16 @@ class LocalAIClient:
             bool: True if the server is running, False otherwise.
         """
         try:
-            response = requests.get(self.health_url, timeout=2)
-            return response.status_code == 200
+            response = self.session.get(self.health_url, timeout=2)
+            running = response.status_code == 200
         except (requests.ConnectionError, requests.Timeout):
-            return False
+            running = False
+        
+        if not running:
+            # A restarted server no longer holds the segments compiled before
+            self.compiled_segments.clear()
+        
+        return running
     
     def get_models(self) -> List[Dict[str, Any]]:
         """
@@ -64,18 +111,118 @@ class LocalAIClient:
             Exception: If the server returns an error.
         """
         try:
-            response = requests.get(self.models_url, headers=self.headers, timeout=10)
+            response = self.session.get(self.models_url, headers=self.headers, timeout=10)
             
             if response.status_code != 200:
                 logger.error(f"Error getting models: {response.status_code}")
                 raise Exception(f"Error: {response.status_code}")
             
-            result = response.json()
+            result = _loads(response.content)
             return result.get("data", [])
         except Exception as e:
             logger.error(f"Error getting models: {e}")
             raise
     
+    @staticmethod
+    def segment_key(segment: str) -> str:
+        """
+        Get the cache key for a prompt segment.
+        
+        Args:
+            segment: The text of the segment.
+        
+        Returns:
+            str: A hex digest identifying the segment.
+        """
+        return hashlib.blake2b(segment.encode("utf-8"), digest_size=16).hexdigest()
+    
+    def get_slot_id(self, prefix: str) -> int:
+        """
+        Get the server slot to use for prompts starting with the given prefix.
+        
+        Requests sharing a prefix are sent to the same slot so that the server
+        can reuse the KV cache it holds for the prefix and only process the
+        rest of the prompt. When all slots are in use, the slot of the least
+        recently used prefix is reassigned.
+        
+        Args:
+            prefix: The prompt prefix.
+        
+        Returns:
+            int: The id of the slot.
+        """
+        key = self.segment_key(prefix)
+        
+        if key in self.prefix_slots:
+            self.prefix_slots.move_to_end(key)
+            return self.prefix_slots[key]
+        
+        if len(self.prefix_slots) < self.max_cached_slots:
+            slot_id = len(self.prefix_slots)
+        else:
+            _, slot_id = self.prefix_slots.popitem(last=False)
+        
+        self.prefix_slots[key] = slot_id
+        return slot_id
+    
+    def compile_segment(
+        self,
+        segment: str,
+        model: str = "deepseek-r1-distill-llama-8b",
+    ) -> str:
+        """
+        Precompute the KV cache of a prompt segment on the server.
+        
+        The segment is encoded with zero-based position ids so that the server
+        can splice its KV cache into any later prompt that contains it,
+        regardless of the tokens preceding it (position-independent caching).
+        Segments that have already been compiled are not sent again.
+        
+        Args:
+            segment: The text of the segment to compile.
+            model: The model to compile the segment for.
+        
+        Returns:
+            str: The key of the compiled segment, to be passed to get_completion.
+        
+        Raises:
+            SegmentCachingUnsupportedError: If the server does not support
+                position-independent caching.
+            Exception: If the server returns any other error.
+        """
+        key = self.segment_key(segment)
+        if key in self.compiled_segments:
+            return key
+        
+        data = {
+            "model": model,
+            "segment": segment,
+            "segment_id": key,
+            "position_ids": "zero-based",
+            "store_kv": True,
+        }
+        
+        try:
+            response = self.session.post(
+                self.segments_url,
+                headers=self.headers,
+                data=_dumps(data),
+                timeout=30
+            )
+            
+            if response.status_code in (404, 405, 501):
+                raise SegmentCachingUnsupportedError(f"Error: {response.status_code}")
+            
+            if response.status_code != 200:
+                logger.error(f"Error compiling segment: {response.status_code}")
+                raise Exception(f"Error: {response.status_code}")
+            
+            self.compiled_segments.add(key)
+            return key
+        except Exception as e:
+            logger.error(f"Error compiling segment: {e}")
+            raise
+    
     def get_completion(
         self,
         prompt: str,
@@ -87,6 +234,10 @@ class LocalAIClient:
         stop: Optional[Union[str, List[str]]] = None,
         presence_penalty: float = 0.0,
         frequency_penalty: float = 0.0,
+        cache_prompt: bool = False,
+        cached_segments: Optional[List[str]] = None,
+        cache_prefix: Optional[str] = None,
+        prompt_token_ids: Optional[List[int]] = None,
     ) -> str:
         """
         Get a completion from the local AI server.
@@ -101,6 +252,14 @@ class LocalAIClient:
             stop: A string or list of strings to stop generation at.
             presence_penalty: The presence penalty to use.
             frequency_penalty: The frequency penalty to use.
+            cache_prompt: Whether the server should reuse the KV cache of a
+                matching prompt prefix from a previous request.
+            cached_segments: Keys of segments compiled with compile_segment
+                whose KV cache should be spliced into the prompt.
+            cache_prefix: Leading part of the prompt shared with other requests.
+                The request is sent to the server slot caching this prefix.
+            prompt_token_ids: The prompt already tokenized for the model. If given,
+                it is sent instead of the prompt text so the server skips tokenization.
         
         Returns:
             str: The generated completion.
@@ -108,9 +267,9 @@ class LocalAIClient:
         Raises:
             Exception: If the server returns an error.
         """
-        data = {
+        data: Dict[str, Any] = {
             "model": model,
-            "prompt": prompt,
+            "prompt": prompt if prompt_token_ids is None else prompt_token_ids,
             "max_tokens": max_tokens,
             "temperature": temperature,
             "top_p": top_p,
@@ -122,11 +281,21 @@ class LocalAIClient:
         if stop is not None:
             data["stop"] = stop
         
+        if cache_prefix:
+            data["id_slot"] = self.get_slot_id(cache_prefix)
+            cache_prompt = True
+        
+        if cache_prompt:
+            data["cache_prompt"] = True
+        
+        if cached_segments:
+            data["cached_segments"] = cached_segments
+        
         try:
-            response = requests.post(
+            response = self.session.post(
                 self.completions_url,
                 headers=self.headers,
-                data=json.dumps(data),
+                data=_dumps(data),
                 timeout=30
             )
             
@@ -134,7 +303,7 @@ class LocalAIClient:
                 logger.error(f"Error getting completion: {response.status_code}")
                 raise Exception(f"Error: {response.status_code}")
             
-            result = response.json()
+            result = _loads(response.content)
             
             if "choices" not in result or len(result["choices"]) == 0:
                 logger.error(f"No choices in completion response: {result}")
@@ -143,6 +312,10 @@ class LocalAIClient:
             return result["choices"][0]["text"]
         except Exception as e:
             logger.error(f"Error getting completion: {e}")
+            if cached_segments:
+                # The server may have lost the segments, e.g. after a restart,
+                # so compile them again next time
+                self.compiled_segments.difference_update(cached_segments)
             raise
     
     def get_chat_completion(
@@ -192,10 +365,10 @@ class LocalAIClient:
             data["stop"] = stop
         
         try:
-            response = requests.post(
+            response = self.session.post(
                 self.chat_completions_url,
                 headers=self.headers,
-                data=json.dumps(data),
+                data=_dumps(data),
                 timeout=30
             )
             
@@ -203,7 +376,7 @@ class LocalAIClient:
                 logger.error(f"Error getting chat completion: {response.status_code}")
                 raise Exception(f"Error: {response.status_code}")
             
-            result = response.json()
+            result = _loads(response.content)
             
             if "choices" not in result or len(result["choices"]) == 0:
                 logger.error(f"No choices in chat completion response: {result}")
@@ -238,10 +411,10 @@ class LocalAIClient:
         }
         
         try:
-            response = requests.post(
+            response = self.session.post(
                 self.embeddings_url,
                 headers=self.headers,
-                data=json.dumps(data),
+                data=_dumps(data),
                 timeout=30
             )
             
@@ -249,7 +422,7 @@ class LocalAIClient:
                 logger.error(f"Error getting embeddings: {response.status_code}")
                 raise Exception(f"Error: {response.status_code}")
             
-            result = response.json()
+            result = _loads(response.content)
             
             if "data" not in result or len(result["data"]) == 0:
                 logger.error(f"No data in embeddings response: {result}")
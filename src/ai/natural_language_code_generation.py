@@ -5,14 +5,53 @@ This module provides a natural language code generation provider that uses local
 to generate code from natural language descriptions.
 """
 
+import functools
 import logging
 import re
-from typing import List, Dict, Any, Optional, Tuple
+from typing import Callable, List, Dict, Any, Optional, Tuple
 
-from .local_ai_client import LocalAIClient
+from .local_ai_client import LocalAIClient, SegmentCachingUnsupportedError
 
 logger = logging.getLogger(__name__)
 
+# Number of leading characters of the code inspected to infer its language
+LANGUAGE_INFERENCE_PREFIX = 1024
+
+
+def _detect_language(code: str) -> Optional[str]:
+    """
+    Detect the programming language of code using simple heuristics.
+    
+    Args:
+        code: The code to detect the language of.
+        
+    Returns:
+        Optional[str]: The detected programming language, or None if unknown.
+    """
+    # This is a simple heuristic and could be improved
+    if "def " in code and ":" in code:
+        return "python"
+    elif "function " in code and "{" in code:
+        return "javascript"
+    elif "class " in code and "extends " in code:
+        return "java"
+    elif "#include" in code and "int main" in code:
+        return "c++"
+    elif "using namespace" in code:
+        return "c++"
+    elif "import React" in code:
+        return "javascript"
+    elif "fn " in code and " -> " in code:
+        return "rust"
+    elif "package main" in code and "func " in code:
+        return "go"
+    else:
+        return None
+
+
+_detect_language_cached = functools.lru_cache(maxsize=32)(_detect_language)
+
+
 class NaturalLanguageCodeGenerator:
     """
     Natural language code generation provider using local AI models.
@@ -31,7 +70,8 @@ class NaturalLanguageCodeGenerator:
         """
         self.config = config or {}
         self.client = LocalAIClient(
-            base_url=self.config.get("base_url", "http://127.0.0.1:1234")
+            base_url=self.config.get("base_url", "http://127.0.0.1:1234"),
+            max_cached_slots=self.config.get("server_slots", 1)
         )
         
         # Default model settings
@@ -43,6 +83,17 @@ class NaturalLanguageCodeGenerator:
         # Context settings
         self.context_window = self.config.get("context_window", 2048)
         
+        # Reuse the server-side KV cache of the context code across requests
+        # whose prompts differ before it. Requires backend support and can
+        # slightly reduce accuracy, so it is disabled by default.
+        self.position_independent_caching = self.config.get("position_independent_caching", False)
+        self._segment_caching_supported = True
+        
+        # Send requests sharing a prompt prefix to the same server slot so that
+        # its KV cache is reused instead of copied or recomputed. The number of
+        # slots is set by the "server_slots" option and must match the server.
+        self.prefix_caching = self.config.get("prefix_caching", False)
+        
         # Language-specific prompts
         self.language_prompts = {
             "python": "Write Python code that",
@@ -62,6 +113,21 @@ class NaturalLanguageCodeGenerator:
         
         # Default language
         self.default_language = self.config.get("default_language", "python")
+        
+        # Optional client-side tokenizer matching the server model. When set,
+        # prompts are sent as token ids and the invariant per-language prompt
+        # scaffolding is only tokenized once.
+        self._tokenizer: Any = None
+        self._prefix_ids: Dict[str, List[int]] = {}
+        
+        tokenizer_name = self.config.get("tokenizer")
+        if tokenizer_name:
+            self._tokenizer = self._load_tokenizer(tokenizer_name)
+        
+        if self._tokenizer is not None:
+            for language in self.language_prompts:
+                self._encode_prefix(self._render_prefix(language, False))
+                self._encode_prefix(self._render_prefix(language, True))
     
     def is_available(self) -> bool:
         """
@@ -93,72 +159,30 @@ class NaturalLanguageCodeGenerator:
         Returns:
             Dict[str, Any]: A dictionary containing the generated code and metadata.
         """
-        if not self.is_available():
-            logger.warning("Natural language code generator is not available")
-            return {
-                "success": False,
-                "error": "Natural language code generator is not available",
-                "code": "",
-                "language": language or self.default_language
-            }
+        # Use the specified language or the default
+        target_language = language or self.default_language
+        context = self._limit_context(context)
         
-        try:
-            # Use the specified language or the default
-            target_language = language or self.default_language
-            
-            # Get the language-specific prompt
-            language_prompt = self.language_prompts.get(
-                target_language.lower(), 
-                f"Write {target_language} code that"
-            )
-            
-            # Build the prompt
-            prompt_parts = []
-            
-            # Add context if provided
-            if context:
-                # Limit context to the context window
-                if len(context) > self.context_window // 2:
-                    logger.warning(f"Context is too long ({len(context)} > {self.context_window // 2}), truncating")
-                    context = context[-(self.context_window // 2):]
-                
-                prompt_parts.append(f"Given the following code context:\n\n```{target_language}\n{context}\n```\n\n")
-            
-            # Add the main prompt
-            prompt_parts.append(f"{language_prompt} {description}")
-            
-            # Add instructions for output format
-            prompt_parts.append("\nProvide only the code without explanations or markdown formatting.")
-            
-            # Combine the prompt parts
-            prompt = "\n".join(prompt_parts)
-            
-            # Generate the code
-            generated_code = self.client.get_completion(
-                prompt=prompt,
-                model=self.model_name,
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-                top_p=self.top_p
-            )
-            
-            # Clean up the generated code
-            cleaned_code = self._clean_generated_code(generated_code, target_language)
-            
-            return {
-                "success": True,
-                "code": cleaned_code,
-                "language": target_language,
+        # Build the prompt
+        prompt_parts = self._build_prompt_parts(description, target_language, context)
+        
+        cache_prefix = "\n".join(prompt_parts)
+        
+        # Add instructions for output format
+        prompt_parts.append("\nProvide only the code without explanations or markdown formatting.")
+        
+        return self._run(
+            "\n".join(prompt_parts),
+            self.max_tokens,
+            target_language,
+            lambda generated: {
+                "code": self._clean_generated_code(generated, target_language),
                 "description": description
-            }
-        except Exception as e:
-            logger.error(f"Error generating code: {e}")
-            return {
-                "success": False,
-                "error": str(e),
-                "code": "",
-                "language": language or self.default_language
-            }
+            },
+            {"code": ""},
+            context,
+            cache_prefix
+        )
     
     def generate_code_with_explanation(
         self, 
@@ -177,77 +201,94 @@ class NaturalLanguageCodeGenerator:
         Returns:
             Dict[str, Any]: A dictionary containing the generated code, explanation, and metadata.
         """
-        if not self.is_available():
-            logger.warning("Natural language code generator is not available")
-            return {
-                "success": False,
-                "error": "Natural language code generator is not available",
-                "code": "",
-                "explanation": "",
-                "language": language or self.default_language
-            }
+        # Use the specified language or the default
+        target_language = language or self.default_language
+        context = self._limit_context(context)
         
-        try:
-            # Use the specified language or the default
-            target_language = language or self.default_language
-            
-            # Get the language-specific prompt
-            language_prompt = self.language_prompts.get(
-                target_language.lower(), 
-                f"Write {target_language} code that"
-            )
-            
-            # Build the prompt
-            prompt_parts = []
-            
-            # Add context if provided
-            if context:
-                # Limit context to the context window
-                if len(context) > self.context_window // 2:
-                    logger.warning(f"Context is too long ({len(context)} > {self.context_window // 2}), truncating")
-                    context = context[-(self.context_window // 2):]
-                
-                prompt_parts.append(f"Given the following code context:\n\n```{target_language}\n{context}\n```\n\n")
-            
-            # Add the main prompt
-            prompt_parts.append(f"{language_prompt} {description}")
-            
-            # Add instructions for output format
-            prompt_parts.append("\nProvide the code followed by a detailed explanation of how it works. Format your response as follows:")
-            prompt_parts.append("\n```" + target_language + "\n[Your code here]\n```")
-            prompt_parts.append("\n## Explanation\n[Your explanation here]")
-            
-            # Combine the prompt parts
-            prompt = "\n".join(prompt_parts)
-            
-            # Generate the code with explanation
-            response = self.client.get_completion(
-                prompt=prompt,
-                model=self.model_name,
-                max_tokens=self.max_tokens * 2,  # Double the tokens for explanation
-                temperature=self.temperature,
-                top_p=self.top_p
-            )
-            
-            # Parse the response to extract code and explanation
+        # Build the prompt
+        prompt_parts = self._build_prompt_parts(description, target_language, context)
+        
+        cache_prefix = "\n".join(prompt_parts)
+        
+        # Add instructions for output format
+        prompt_parts.append("\nProvide the code followed by a detailed explanation of how it works. Format your response as follows:")
+        prompt_parts.append("\n```" + target_language + "\n[Your code here]\n```")
+        prompt_parts.append("\n## Explanation\n[Your explanation here]")
+        
+        def postprocess(response: str) -> Dict[str, Any]:
             code, explanation = self._parse_code_and_explanation(response, target_language)
+            return {"code": code, "explanation": explanation, "description": description}
+        
+        return self._run(
+            "\n".join(prompt_parts),
+            self.max_tokens * 2,  # Double the tokens for explanation
+            target_language,
+            postprocess,
+            {"code": "", "explanation": ""},
+            context,
+            cache_prefix
+        )
+    
+    def explain_code(
+        self, 
+        code: str, 
+        language: str, 
+        description: Optional[str] = None, 
+        context: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate an explanation for code that has already been generated.
+        
+        The code is supplied as part of the prompt so that only the explanation
+        has to be generated, instead of regenerating the code along with it
+        as generate_code_with_explanation does. If the description and context
+        the code was generated from are given, the prompt starts the same way
+        as the generation prompt, so the server can reuse its cached prefix.
+        
+        Args:
+            code: The code to explain.
+            language: The programming language of the code.
+            description: The natural language description the code was generated from.
+            context: The context code the code was generated with.
             
-            return {
-                "success": True,
-                "code": code,
-                "explanation": explanation,
-                "language": target_language,
-                "description": description
-            }
-        except Exception as e:
-            logger.error(f"Error generating code with explanation: {e}")
-            return {
-                "success": False,
-                "error": str(e),
-                "code": "",
-                "explanation": "",
-                "language": language or self.default_language
-            }
+        Returns:
+            Dict[str, Any]: A dictionary containing the explanation and metadata.
+        """
+        cache_prefix = None
+        
+        # Build the prompt, ending where the explanation should start
+        if description:
+            context = self._limit_context(context)
+            cache_prefix = "\n".join(self._build_prompt_parts(description, language, context))
+            prompt = f"""{cache_prefix}
+
+```{language}
+{self._limit_code(code)}
+```
+
+## Explanation
+"""
+        else:
+            # The context is not part of this prompt, so it must not be cached for it
+            context = None
+            prompt = f"""Explain how the following {language} code works.
+
+```{language}
+{self._limit_code(code)}
+```
+
+## Explanation
+"""
+        
+        return self._run(
+            prompt,
+            self.max_tokens,
+            language,
+            lambda explanation: {"code": code, "explanation": explanation.strip()},
+            {"code": code, "explanation": ""},
+            context,
+            cache_prefix
+        )
     
     def improve_code(
         self, 
@@ -266,60 +307,273 @@ class NaturalLanguageCodeGenerator:
         Returns:
             Dict[str, Any]: A dictionary containing the improved code and metadata.
         """
-        if not self.is_available():
-            logger.warning("Natural language code generator is not available")
-            return {
-                "success": False,
-                "error": "Natural language code generator is not available",
-                "code": code,
-                "language": language or self._infer_language(code)
-            }
+        # Infer the language if not provided
+        target_language = language or self._infer_language(code)
         
-        try:
-            # Infer the language if not provided
-            target_language = language or self._infer_language(code)
-            
-            # Limit code to the context window
-            if len(code) > self.context_window // 2:
-                logger.warning(f"Code is too long ({len(code)} > {self.context_window // 2}), truncating")
-                code = code[-(self.context_window // 2):]
-            
-            # Build the prompt
-            prompt = f"""Improve the following {target_language} code according to these instructions: {instructions}
+        # Build the prompt
+        prompt = f"""Improve the following {target_language} code according to these instructions: {instructions}
 
 ```{target_language}
-{code}
+{self._limit_code(code)}
 ```
 
 Provide only the improved code without explanations or markdown formatting.
 """
+        
+        return self._run(
+            prompt,
+            self.max_tokens,
+            target_language,
+            lambda improved: {
+                "code": self._clean_generated_code(improved, target_language),
+                "instructions": instructions
+            },
+            {"code": code}
+        )
+    
+    def _run(
+        self,
+        prompt: str,
+        max_tokens: int,
+        language: str,
+        postprocess: Callable[[str], Dict[str, Any]],
+        failure_fields: Dict[str, Any],
+        context: Optional[str] = None,
+        cache_prefix: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Run a completion request and build the result dictionary.
+        
+        Args:
+            prompt: The prompt to send to the model.
+            max_tokens: The maximum number of tokens to generate.
+            language: The programming language of the result.
+            postprocess: Function turning the raw completion into result fields.
+            failure_fields: Result fields to return if the request fails.
+            context: The context code included in the prompt, if any.
+            cache_prefix: Leading part of the prompt shared with related requests.
             
-            # Generate the improved code
-            improved_code = self.client.get_completion(
+        Returns:
+            Dict[str, Any]: A dictionary containing the result and metadata.
+        """
+        if not self.is_available():
+            logger.warning("Natural language code generator is not available")
+            return self._fail("Natural language code generator is not available", language, failure_fields)
+        
+        try:
+            generated = self.client.get_completion(
                 prompt=prompt,
                 model=self.model_name,
-                max_tokens=self.max_tokens,
+                max_tokens=max_tokens,
                 temperature=self.temperature,
-                top_p=self.top_p
+                top_p=self.top_p,
+                prompt_token_ids=self._tokenize_prompt(prompt, language, context),
+                **self._cache_options(context, cache_prefix)
             )
             
-            # Clean up the improved code
-            cleaned_code = self._clean_generated_code(improved_code, target_language)
+            result = {"success": True, "language": language}
+            result.update(postprocess(generated))
+            return result
+        except Exception as e:
+            logger.error(f"Error generating code: {e}")
+            return self._fail(str(e), language, failure_fields)
+    
+    def _fail(self, error: str, language: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the result dictionary of a failed request.
+        
+        Args:
+            error: The error message.
+            language: The programming language of the request.
+            fields: Additional result fields.
             
-            return {
-                "success": True,
-                "code": cleaned_code,
-                "language": target_language,
-                "instructions": instructions
-            }
+        Returns:
+            Dict[str, Any]: A dictionary describing the failure.
+        """
+        result = {"success": False, "error": error, "language": language}
+        result.update(fields)
+        return result
+    
+    def _build_prompt_parts(
+        self, 
+        description: str, 
+        language: str, 
+        context: Optional[str]
+    ) -> List[str]:
+        """
+        Build the common leading parts of a code generation prompt.
+        
+        Args:
+            description: The natural language description of the code to generate.
+            language: The programming language to generate code in.
+            context: Optional context code to help guide the generation.
+            
+        Returns:
+            List[str]: The prompt parts.
+        """
+        # Get the language-specific prompt
+        language_prompt = self._render_prefix(language, False)
+        
+        prompt_parts = []
+        
+        # Add context if provided
+        if context:
+            prompt_parts.append(f"{self._render_prefix(language, True)}{context}\n```\n\n")
+        
+        # Add the main prompt
+        prompt_parts.append(f"{language_prompt} {description}")
+        
+        return prompt_parts
+    
+    def _render_prefix(self, language: str, with_context: bool) -> str:
+        """
+        Get the invariant leading text of a code generation prompt.
+        
+        Args:
+            language: The programming language to generate code in.
+            with_context: Whether the prompt starts with context code.
+            
+        Returns:
+            str: The prompt text preceding the context or the description.
+        """
+        if with_context:
+            return f"Given the following code context:\n\n```{language}\n"
+        
+        return self.language_prompts.get(
+            language.lower(), 
+            f"Write {language} code that"
+        )
+    
+    def _load_tokenizer(self, name: str) -> Optional[Any]:
+        """
+        Load a Hugging Face tokenizer.
+        
+        Args:
+            name: The name or path of the tokenizer.
+            
+        Returns:
+            Optional[Any]: The tokenizer, or None if it could not be loaded.
+        """
+        try:
+            from transformers import AutoTokenizer  # type: ignore[import-not-found]
+            return AutoTokenizer.from_pretrained(name)
         except Exception as e:
-            logger.error(f"Error improving code: {e}")
-            return {
-                "success": False,
-                "error": str(e),
-                "code": code,
-                "language": language or self._infer_language(code)
-            }
+            logger.warning(f"Could not load tokenizer {name}, sending prompts as text: {e}")
+            return None
+    
+    def _encode_prefix(self, prefix: str) -> List[int]:
+        """
+        Get the token ids of an invariant prompt prefix, tokenizing it only once.
+        
+        Args:
+            prefix: The prompt prefix.
+            
+        Returns:
+            List[int]: The token ids of the prefix.
+        """
+        prefix_ids = self._prefix_ids.get(prefix)
+        
+        if prefix_ids is None:
+            prefix_ids = self._tokenizer.encode(prefix)
+            self._prefix_ids[prefix] = prefix_ids
+        
+        return prefix_ids
+    
+    def _tokenize_prompt(self, prompt: str, language: str, context: Optional[str]) -> Optional[List[int]]:
+        """
+        Tokenize a prompt, reusing the token ids of its invariant prefix.
+        
+        Args:
+            prompt: The prompt to tokenize.
+            language: The programming language of the prompt.
+            context: The context code included in the prompt, if any.
+            
+        Returns:
+            Optional[List[int]]: The token ids of the prompt, or None if no tokenizer
+                is configured or the prompt has no known prefix.
+        """
+        if self._tokenizer is None:
+            return None
+        
+        prefix = self._render_prefix(language, bool(context))
+        if not prompt.startswith(prefix):
+            return None
+        
+        return self._encode_prefix(prefix) + self._tokenizer.encode(
+            prompt[len(prefix):], 
+            add_special_tokens=False
+        )
+    
+    def _limit_context(self, context: Optional[str]) -> Optional[str]:
+        """
+        Limit context code to half of the context window.
+        
+        Args:
+            context: The context code, if any.
+            
+        Returns:
+            Optional[str]: The context code, truncated from the start if too long.
+        """
+        if context and len(context) > self.context_window // 2:
+            logger.warning(f"Context is too long ({len(context)} > {self.context_window // 2}), truncating")
+            context = context[-(self.context_window // 2):]
+        
+        return context
+    
+    def _limit_code(self, code: str) -> str:
+        """
+        Limit code included in a prompt to half of the context window.
+        
+        Args:
+            code: The code to include in the prompt.
+            
+        Returns:
+            str: The code, truncated from the start if too long.
+        """
+        if len(code) > self.context_window // 2:
+            logger.warning(f"Code is too long ({len(code)} > {self.context_window // 2}), truncating")
+            code = code[-(self.context_window // 2):]
+        
+        return code
+    
+    def _cache_options(self, context: Optional[str], cache_prefix: Optional[str]) -> Dict[str, Any]:
+        """
+        Get the completion options for reusing server-side KV caches.
+        
+        With prefix caching enabled, requests sharing a prompt prefix are sent to
+        the same server slot. With position-independent caching enabled, the context
+        is compiled on the server once and its KV cache is spliced into every prompt
+        containing it. If the server does not support this, standard prefix caching
+        is used from then on; if compiling fails for another reason, it is only used
+        for the current request.
+        
+        Args:
+            context: The (possibly truncated) context code included in the prompt.
+            cache_prefix: Leading part of the prompt shared with related requests.
+            
+        Returns:
+            Dict[str, Any]: Extra keyword arguments for LocalAIClient.get_completion.
+        """
+        options: Dict[str, Any] = {}
+        
+        if self.prefix_caching and cache_prefix:
+            options["cache_prefix"] = cache_prefix
+        
+        if not context or not self.position_independent_caching:
+            return options
+        
+        if self._segment_caching_supported:
+            try:
+                options["cached_segments"] = [self.client.compile_segment(context, model=self.model_name)]
+                return options
+            except SegmentCachingUnsupportedError as e:
+                logger.warning(f"Position-independent caching is not supported, falling back to prefix caching: {e}")
+                self._segment_caching_supported = False
+            except Exception as e:
+                logger.warning(f"Could not compile the context, using prefix caching for this request: {e}")
+        
+        options["cache_prompt"] = True
+        return options
     
     def _clean_generated_code(self, generated_code: str, language: str) -> str:
         """
@@ -354,6 +608,22 @@ Provide only the improved code without explanations or markdown formatting.
         Returns:
             Tuple[str, str]: The code and explanation.
         """
+        # Fast path for the format requested in the prompt:
+        # ```language\n[code]\n```\n## Explanation\n[explanation]
+        open_index = response.find("```")
+        if open_index != -1:
+            newline_index = response.find("\n", open_index + 3)
+            if newline_index != -1:
+                close_index = response.find("```", newline_index + 1)
+                if close_index != -1:
+                    code = response[newline_index + 1:close_index].strip()
+                    header_index = response.find("## Explanation", close_index + 3)
+                    if header_index != -1:
+                        explanation = response[header_index + len("## Explanation"):].strip()
+                    else:
+                        explanation = response[close_index + 3:].strip()
+                    return code, explanation
+        
         # Try to extract code block
         code_block_pattern = r"```(?:\w+)?\n([\s\S]*?)\n```"
         code_blocks = re.findall(code_block_pattern, response)
@@ -394,29 +664,24 @@ Provide only the improved code without explanations or markdown formatting.
         """
         Infer the programming language from the code.
         
+        Only the start of the code is inspected, and the result is cached, since
+        the same buffer is typically passed repeatedly. The whole code is only
+        scanned if its start is inconclusive. A language detected in the start
+        therefore takes precedence over one whose markers only appear later,
+        even where a whole-code scan would rank the later one first. Callers
+        that know the language, such as an editor tab, should pass it instead
+        of relying on inference.
+        
         Args:
             code: The code to infer the language from.
             
         Returns:
             str: The inferred programming language.
         """
-        # This is a simple heuristic and could be improved
-        if "def " in code and ":" in code:
-            return "python"
-        elif "function " in code and "{" in code:
-            return "javascript"
-        elif "class " in code and "extends " in code:
-            return "java"
-        elif "#include" in code and "int main" in code:
-            return "c++"
-        elif "using namespace" in code:
-            return "c++"
-        elif "import React" in code:
-            return "javascript"
-        elif "fn " in code and " -> " in code:
-            return "rust"
-        elif "package main" in code and "func " in code:
-            return "go"
-        else:
-            # Default to the default language
-            return self.default_language
+        language = _detect_language_cached(code[:LANGUAGE_INFERENCE_PREFIX])
+        
+        if language is None and len(code) > LANGUAGE_INFERENCE_PREFIX:
+            language = _detect_language(code)
+        
+        # Default to the default language
+        return language or self.default_language
@@ -8,7 +8,7 @@ import logging
 import time
 from typing import Optional, Dict, Any
 
-from PyQt5.QtWidgets import QPlainTextEdit, QWidget
+from PyQt5.QtWidgets import QPlainTextEdit, QTextEdit, QWidget
 from PyQt5.QtGui import (
     QFont, QTextOption, QColor, QPainter, QTextFormat, 
     QSyntaxHighlighter, QTextCharFormat
@@ -19,6 +19,10 @@ from .incremental_syntax_highlighter import IncrementalSyntaxHighlighter
 
 logger = logging.getLogger(__name__)
 
+# Colors used when painting, computed once rather than on every paint event
+LINE_NUMBER_AREA_COLOR = QColor(Qt.GlobalColor.lightGray).lighter(120)
+CURRENT_LINE_COLOR = QColor(Qt.GlobalColor.yellow).lighter(180)
+
 class LineNumberArea(QWidget):
     """
     Widget for displaying line numbers in the code editor.
@@ -189,7 +193,7 @@ class CodeEditor(QPlainTextEdit):
             event: The paint event.
         """
         painter = QPainter(self.line_number_area)
-        painter.fillRect(event.rect(), QColor(Qt.lightGray).lighter(120))
+        painter.fillRect(event.rect(), LINE_NUMBER_AREA_COLOR)
         
         block = self.firstVisibleBlock()
         block_number = block.blockNumber()
@@ -217,9 +221,7 @@ class CodeEditor(QPlainTextEdit):
         if not self.isReadOnly():
             selection = QTextEdit.ExtraSelection()
             
-            line_color = QColor(Qt.yellow).lighter(180)
-            
-            selection.format.setBackground(line_color)
+            selection.format.setBackground(CURRENT_LINE_COLOR)
             selection.format.setProperty(QTextFormat.FullWidthSelection, True)
             selection.cursor = self.textCursor()
             selection.cursor.clearSelection()
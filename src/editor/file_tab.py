@@ -5,9 +5,18 @@ This module provides a file tab component for RebelDESK.
 """
 
 import os
+import sys
+import codecs
+import shutil
 import logging
+from collections import OrderedDict
 from typing import Optional, Dict, Any
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # type: ignore[assignment]
+
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QFileDialog, QMessageBox
 from PyQt5.QtCore import pyqtSignal, Qt
 
@@ -15,6 +24,183 @@ from .code_editor import CodeEditor
 
 logger = logging.getLogger(__name__)
 
+# Save dialog filters for known file extensions
+EXTENSION_FILTERS = {
+    ".py": "Python Files (*.py);;All Files (*)",
+    ".txt": "Text Files (*.txt);;All Files (*)",
+    ".md": "Markdown Files (*.md);;All Files (*)",
+    ".json": "JSON Files (*.json);;All Files (*)",
+    ".html": "HTML Files (*.html);;All Files (*)",
+    ".css": "CSS Files (*.css);;All Files (*)",
+    ".js": "JavaScript Files (*.js);;All Files (*)"
+}
+
+# Decoded contents of recently loaded files, keyed by path and stat signature
+MAX_CACHED_FILES = 16
+MAX_CACHED_FILE_SIZE = 1024 * 1024
+_content_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+# Encodings tried, in order, for text that is not valid UTF-8. Latin-1 maps
+# every byte, so it always succeeds.
+FALLBACK_ENCODINGS = ("cp1252", "latin-1")
+
+# Byte order marks and the encodings of the text that follows them. UTF-32
+# comes first because its little-endian mark starts with the UTF-16 one.
+BYTE_ORDER_MARKS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be")
+)
+
+# Encodings whose codecs neither strip nor write the byte order mark
+# (unlike utf-8-sig), so it is handled by hand
+EXPLICIT_BOM_ENCODINGS = {"utf-32-le", "utf-32-be", "utf-16-le", "utf-16-be"}
+
+# ioctl request cloning a file's extents on Linux (Btrfs, XFS, ...)
+FICLONE = 0x40049409
+CLONE_SUPPORTED = fcntl is not None and sys.platform.startswith("linux")
+
+
+def _copy_file(src_path: str, dst_path: str):
+    """
+    Copy the contents of a file.
+    
+    On Linux filesystems that support it, the copy is a copy-on-write clone
+    that shares the source's data blocks instead of duplicating them. Other
+    filesystems and platforms fall back to a regular copy.
+    
+    Args:
+        src_path: The path of the file to copy.
+        dst_path: The path of the copy.
+    """
+    if CLONE_SUPPORTED:
+        with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                return
+            except OSError:
+                # Cloning is not supported here, e.g. ext4 or across filesystems
+                pass
+    
+    shutil.copyfile(src_path, dst_path)
+
+
+def _decode_text(data: bytes):
+    """
+    Decode the contents of a text file.
+    
+    Files starting with a byte order mark are decoded accordingly, then UTF-8
+    is tried, then each of FALLBACK_ENCODINGS in turn.
+    
+    Args:
+        data: The raw contents of the file.
+        
+    Returns:
+        tuple: The decoded text and the name of the encoding used.
+        
+    Raises:
+        UnicodeDecodeError: If the data looks like a binary file.
+    """
+    # A byte order mark identifies the encoding without trying UTF-8 first
+    for bom, encoding in BYTE_ORDER_MARKS:
+        if data.startswith(bom):
+            if encoding in EXPLICIT_BOM_ENCODINGS:
+                data = data[len(bom):]
+            return data.decode(encoding), encoding
+    
+    try:
+        return data.decode("utf-8"), "utf-8"
+    except UnicodeDecodeError:
+        # Text files in single-byte encodings do not contain NUL bytes
+        if b"\x00" in data:
+            raise
+        
+        for encoding in FALLBACK_ENCODINGS:
+            try:
+                return data.decode(encoding), encoding
+            except UnicodeDecodeError:
+                continue
+        
+        raise
+
+
+def _write_text(file_path: str, text: str, encoding: str):
+    """
+    Write text to a file and flush it to disk.
+    
+    Args:
+        file_path: The path of the file.
+        text: The text to write.
+        encoding: The encoding to write the text in.
+    """
+    with open(file_path, "w", encoding=encoding) as f:
+        if encoding in EXPLICIT_BOM_ENCODINGS:
+            # Keep the file's byte order mark, in its original byte order
+            f.write("\ufeff")
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _read_text(file_path: str, stat_result: os.stat_result):
+    """
+    Read and decode a text file, reusing the result of a previous read if the
+    file has not changed since.
+    
+    Args:
+        file_path: The path of the file.
+        stat_result: The result of stat() on the file.
+        
+    Returns:
+        tuple: The text with normalized line endings and the name of its encoding.
+        
+    Raises:
+        UnicodeDecodeError: If the file looks like a binary file.
+    """
+    key = (file_path, stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+    if key in _content_cache:
+        _content_cache.move_to_end(key)
+        return _content_cache[key]
+    
+    # Read the file once and decode it in memory
+    with open(file_path, "rb") as f:
+        content, encoding = _decode_text(f.read())
+    
+    # Normalize line endings the way text mode would
+    content = content.replace("\r\n", "\n").replace("\r", "\n")
+    
+    if stat_result.st_size <= MAX_CACHED_FILE_SIZE:
+        _content_cache[key] = (content, encoding)
+        if len(_content_cache) > MAX_CACHED_FILES:
+            _content_cache.popitem(last=False)
+    
+    return content, encoding
+
+
+def _drop_cached_pages(file_path: str):
+    """
+    Advise the kernel that a file's cached pages are no longer needed.
+    
+    This is a no-op on platforms without posix_fadvise.
+    
+    Args:
+        file_path: The path of the file.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    
+    try:
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        logger.debug(f"Failed to drop cached pages of {file_path}: {e}")
+
+
 class FileTab(QWidget):
     """
     File tab component for RebelDESK.
@@ -43,6 +229,7 @@ class FileTab(QWidget):
         self.file_path = file_path
         self.config = config or {}
         self.modified = False
+        self.encoding = "utf-8"
         
         # Set up the UI
         self._setup_ui()
@@ -129,8 +316,11 @@ class FileTab(QWidget):
             )
             return False
             
-        # Check if file exists
-        if not os.path.exists(file_path):
+        # Check if file exists, getting its size from the same stat call
+        try:
+            stat_result = os.stat(file_path)
+            file_size = stat_result.st_size
+        except OSError:
             logger.error(f"File not found: {file_path}")
             QMessageBox.critical(
                 self,
@@ -141,7 +331,6 @@ class FileTab(QWidget):
             
         try:
             # Check file size before loading
-            file_size = os.path.getsize(file_path)
             max_size = self.config.get("max_file_size", 10 * 1024 * 1024)  # Default: 10MB
             
             if file_size > max_size:
@@ -158,11 +347,14 @@ class FileTab(QWidget):
                     return False
             
             # Load file content
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
+            content, encoding = _read_text(file_path, stat_result)
+            
+            if encoding != "utf-8":
+                logger.info(f"Detected {encoding} encoding for {file_path}")
             
             self.editor.set_text(content)
             self.file_path = file_path
+            self.encoding = encoding
             self.modified = False
             
             # Update the tab title
@@ -209,16 +401,16 @@ class FileTab(QWidget):
             return self.save_file_as()
         
         # Create a backup of the file if it exists
-        if os.path.exists(self.file_path):
-            try:
-                backup_path = f"{self.file_path}.bak"
-                with open(self.file_path, "r", encoding="utf-8") as src:
-                    with open(backup_path, "w", encoding="utf-8") as dst:
-                        dst.write(src.read())
-                logger.info(f"Created backup of {self.file_path} at {backup_path}")
-            except Exception as e:
-                logger.warning(f"Failed to create backup of {self.file_path}: {e}")
-                # Continue with save operation even if backup fails
+        backup_path = f"{self.file_path}.bak"
+        try:
+            _copy_file(self.file_path, backup_path)
+            logger.info(f"Created backup of {self.file_path} at {backup_path}")
+        except FileNotFoundError:
+            # The file has not been written yet, so there is nothing to back up
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to create backup of {self.file_path}: {e}")
+            # Continue with save operation even if backup fails
         
         try:
             # Get the text to save
@@ -226,14 +418,28 @@ class FileTab(QWidget):
             
             # Write to a temporary file first
             temp_path = f"{self.file_path}.tmp"
-            with open(temp_path, "w", encoding="utf-8") as f:
-                f.write(text)
+            try:
+                try:
+                    _write_text(temp_path, text, self.encoding)
+                except UnicodeEncodeError as e:
+                    # The text no longer fits the file's original encoding
+                    logger.warning(
+                        f"Cannot encode {self.file_path} as {self.encoding}, saving it as UTF-8: {e}"
+                    )
+                    self.encoding = "utf-8"
+                    _write_text(temp_path, text, self.encoding)
+                
+                # Replace the actual file with the temporary file
+                # This ensures an atomic write operation
+                os.replace(temp_path, self.file_path)
+            except Exception:
+                # Don't leave a partially written temporary file behind
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
             
-            # Rename the temporary file to the actual file
-            # This ensures an atomic write operation
-            if os.path.exists(self.file_path):
-                os.remove(self.file_path)
-            os.rename(temp_path, self.file_path)
+            # The written data is already in the editor, so release it from the page cache
+            _drop_cached_pages(self.file_path)
             
             self.modified = False
             self.fileModified.emit(False)
@@ -290,20 +496,7 @@ class FileTab(QWidget):
             file_filter = "All Files (*)"
             if self.file_path:
                 ext = os.path.splitext(self.file_path)[1].lower()
-                if ext == ".py":
-                    file_filter = "Python Files (*.py);;All Files (*)"
-                elif ext == ".txt":
-                    file_filter = "Text Files (*.txt);;All Files (*)"
-                elif ext == ".md":
-                    file_filter = "Markdown Files (*.md);;All Files (*)"
-                elif ext == ".json":
-                    file_filter = "JSON Files (*.json);;All Files (*)"
-                elif ext == ".html":
-                    file_filter = "HTML Files (*.html);;All Files (*)"
-                elif ext == ".css":
-                    file_filter = "CSS Files (*.css);;All Files (*)"
-                elif ext == ".js":
-                    file_filter = "JavaScript Files (*.js);;All Files (*)"
+                file_filter = EXTENSION_FILTERS.get(ext, file_filter)
             
             # Show the save dialog
             file_path, selected_filter = QFileDialog.getSaveFileName(
@@ -19,6 +19,19 @@ from PyQt5.QtGui import (
 
 logger = logging.getLogger(__name__)
 
+# Python keywords
+KEYWORDS = [
+    "and", "as", "assert", "break", "class", "continue", "def",
+    "del", "elif", "else", "except", "False", "finally", "for",
+    "from", "global", "if", "import", "in", "is", "lambda", "None",
+    "nonlocal", "not", "or", "pass", "raise", "return", "True",
+    "try", "while", "with", "yield"
+]
+
+# All keywords in a single pattern, so a block is scanned once rather than
+# once per keyword
+KEYWORD_PATTERN = "\\b(?:" + "|".join(KEYWORDS) + ")\\b"
+
 class HighlightingRule:
     """A rule for syntax highlighting."""
     
@@ -97,17 +110,9 @@ class IncrementalSyntaxHighlighter(QSyntaxHighlighter):
         # Create rules
         
         # Python keywords
-        keywords = [
-            "and", "as", "assert", "break", "class", "continue", "def",
-            "del", "elif", "else", "except", "False", "finally", "for",
-            "from", "global", "if", "import", "in", "is", "lambda", "None",
-            "nonlocal", "not", "or", "pass", "raise", "return", "True",
-            "try", "while", "with", "yield"
-        ]
-        
-        for keyword in keywords:
-            pattern = f"\\b{keyword}\\b"
-            self.highlighting_rules.append(HighlightingRule(pattern, keyword_format))
+        self.highlighting_rules.append(
+            HighlightingRule(KEYWORD_PATTERN, keyword_format)
+        )
             
         # Class names
         self.highlighting_rules.append(
@@ -207,14 +207,12 @@ class PluginManager:
                 logger.warning(f"Plugin directory does not exist: {plugin_dir}")
                 continue
             
-            # Iterate over subdirectories
-            for item in os.listdir(plugin_dir):
-                item_path = os.path.join(plugin_dir, item)
-                
-                # Skip non-directories
-                if not os.path.isdir(item_path):
-                    continue
-                
+            # Iterate over subdirectories, using scandir's cached file types
+            # rather than a stat call per entry
+            with os.scandir(plugin_dir) as entries:
+                subdirectories = [entry.path for entry in entries if entry.is_dir()]
+            
+            for item_path in subdirectories:
                 # Check for plugin.json
                 metadata_path = os.path.join(item_path, "plugin.json")
                 if not os.path.exists(metadata_path):
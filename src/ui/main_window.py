@@ -13,6 +13,18 @@ from src.editor import FileTab
 
 logger = logging.getLogger(__name__)
 
+# File extensions of the languages detected by _detect_language_from_code
+LANGUAGE_EXTENSIONS = {
+    "python": ".py",
+    "javascript": ".js",
+    "typescript": ".ts",
+    "html": ".html",
+    "css": ".css",
+    "java": ".java",
+    "cpp": ".cpp",
+    "text": ".txt"
+}
+
 class MainWindow(QMainWindow):
     """
     Main window for the RebelDESK application.
@@ -512,18 +524,7 @@ class MainWindow(QMainWindow):
         Returns:
             str: The file extension.
         """
-        extensions = {
-            "python": ".py",
-            "javascript": ".js",
-            "typescript": ".ts",
-            "html": ".html",
-            "css": ".css",
-            "java": ".java",
-            "cpp": ".cpp",
-            "text": ".txt"
-        }
-        
-        return extensions.get(language, "")
+        return LANGUAGE_EXTENSIONS.get(language, "")
     
     def _on_about(self):
         """
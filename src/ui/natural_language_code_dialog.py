@@ -48,6 +48,11 @@ class NaturalLanguageCodeDialog(QDialog):
         self.config = config or {}
         self.on_code_generated = on_code_generated
         
+        # Request the code shown in the output was generated from, used to explain it later
+        self.generated_language: Optional[str] = None
+        self.generated_description: Optional[str] = None
+        self.generated_context: Optional[str] = None
+        
         # Create the code generator
         self.code_generator = NaturalLanguageCodeGenerator(self.config.get("ai", {}))
         
@@ -169,6 +174,11 @@ class NaturalLanguageCodeDialog(QDialog):
         self.generate_button.clicked.connect(self._generate_code)
         button_layout.addWidget(self.generate_button)
         
+        self.explain_button = QPushButton("Explain Code")
+        self.explain_button.clicked.connect(self._explain_code)
+        self.explain_button.setEnabled(False)
+        button_layout.addWidget(self.explain_button)
+        
         self.insert_button = QPushButton("Insert Code")
         self.insert_button.clicked.connect(self._insert_code)
         self.insert_button.setEnabled(False)
@@ -214,6 +224,7 @@ class NaturalLanguageCodeDialog(QDialog):
                     self.code_edit.setText(result["code"])
                     self.explanation_edit.setText(result["explanation"])
                     self.explanation_group.setVisible(True)
+                    self.explain_button.setEnabled(False)
                     self.insert_button.setEnabled(True)
                 else:
                     QMessageBox.warning(
@@ -231,6 +242,10 @@ class NaturalLanguageCodeDialog(QDialog):
                 if result["success"]:
                     self.code_edit.setText(result["code"])
                     self.explanation_group.setVisible(False)
+                    self.generated_language = result["language"]
+                    self.generated_description = description
+                    self.generated_context = context
+                    self.explain_button.setEnabled(True)
                     self.insert_button.setEnabled(True)
                 else:
                     QMessageBox.warning(
@@ -249,6 +264,46 @@ class NaturalLanguageCodeDialog(QDialog):
             # Restore the cursor
             QApplication.restoreOverrideCursor()
     
+    def _explain_code(self):
+        """Explain the code that has already been generated."""
+        code = self.code_edit.toPlainText()
+        
+        if not code:
+            return
+        
+        # Show a busy cursor
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        
+        try:
+            # Only the explanation is generated, the code is reused as-is
+            result = self.code_generator.explain_code(
+                code=code,
+                language=self.generated_language or self.language_combo.currentText().lower(),
+                description=self.generated_description,
+                context=self.generated_context
+            )
+            
+            if result["success"]:
+                self.explanation_edit.setText(result["explanation"])
+                self.explanation_group.setVisible(True)
+                self.explain_button.setEnabled(False)
+            else:
+                QMessageBox.warning(
+                    self,
+                    "Error Explaining Code",
+                    f"An error occurred while explaining code: {result.get('error', 'Unknown error')}"
+                )
+        except Exception as e:
+            logger.error(f"Error explaining code: {e}", exc_info=True)
+            QMessageBox.critical(
+                self,
+                "Error",
+                f"An error occurred while explaining code: {str(e)}"
+            )
+        finally:
+            # Restore the cursor
+            QApplication.restoreOverrideCursor()
+    
     def _insert_code(self):
         """Insert the generated code into the editor."""
         if self.on_code_generated:
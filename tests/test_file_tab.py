@@ -93,6 +93,110 @@ class TestFileTab:
             # Clean up
             os.unlink(file_path)
     
+    def test_file_tab_reload_file(self, file_tab):
+        """Test that reloading a file picks up changes made on disk."""
+        # Create a temporary file
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".py", delete=False) as f:
+            f.write("print('Hello')\n")
+            file_path = f.name
+        
+        try:
+            # Load the file twice without changes
+            assert file_tab.load_file(file_path)
+            assert file_tab.load_file(file_path)
+            assert file_tab.get_text() == "print('Hello')\n"
+            
+            # Change the file on disk and load it again
+            with open(file_path, "w") as f:
+                f.write("print('Hello, World!')\n")
+            assert file_tab.load_file(file_path)
+            assert file_tab.get_text() == "print('Hello, World!')\n"
+        finally:
+            # Clean up
+            os.unlink(file_path)
+    
+    def test_file_tab_load_file_encoding(self, file_tab):
+        """Test loading and saving a file that is not UTF-8 encoded."""
+        # Create a temporary file in a legacy encoding
+        test_text = "# Cr\u00e9\u00e9 par l'\u00e9quipe\nprint('Ol\u00e1, ma\u00f1ana, \u00fcber, gar\u00e7on')\n"
+        test_data = test_text.encode("cp1252")
+        with tempfile.NamedTemporaryFile(mode="wb", suffix=".py", delete=False) as f:
+            f.write(test_data)
+            file_path = f.name
+        
+        try:
+            # Load the file
+            assert file_tab.load_file(file_path)
+            
+            # Check that the text is decoded correctly
+            assert file_tab.encoding == "cp1252"
+            assert file_tab.get_text() == test_text
+            
+            # Check that saving the unchanged file writes the same bytes back
+            assert file_tab.save_file()
+            with open(file_path, "rb") as f:
+                assert f.read() == test_data
+        finally:
+            # Clean up
+            os.unlink(file_path)
+            if os.path.exists(f"{file_path}.bak"):
+                os.unlink(f"{file_path}.bak")
+    
+    def test_file_tab_save_file_unencodable(self, file_tab):
+        """Test saving text that the file's original encoding cannot represent."""
+        # Create a temporary file in a legacy encoding
+        with tempfile.NamedTemporaryFile(mode="wb", suffix=".py", delete=False) as f:
+            f.write("# caf\u00e9\n".encode("cp1252"))
+            file_path = f.name
+        
+        try:
+            # Load the file and add a character outside its encoding
+            assert file_tab.load_file(file_path)
+            assert file_tab.encoding == "cp1252"
+            file_tab.set_text("# caf\u00e9 \u2615\U0001f600\n")
+            
+            # Check that the file is saved as UTF-8 instead
+            assert file_tab.save_file()
+            assert file_tab.encoding == "utf-8"
+            with open(file_path, "r", encoding="utf-8") as f:
+                assert f.read() == "# caf\u00e9 \u2615\U0001f600\n"
+            
+            # Check that no temporary file is left behind
+            assert not os.path.exists(f"{file_path}.tmp")
+        finally:
+            # Clean up
+            os.unlink(file_path)
+            if os.path.exists(f"{file_path}.bak"):
+                os.unlink(f"{file_path}.bak")
+    
+    @pytest.mark.parametrize("encoding", ["utf-8-sig", "utf-16-le", "utf-16-be", "utf-32-le", "utf-32-be"])
+    def test_file_tab_load_file_byte_order_mark(self, file_tab, encoding):
+        """Test loading and saving a file that starts with a byte order mark."""
+        # Create a temporary file with a byte order mark
+        test_text = "def test_function():\n    return 'Hello, World!'\n"
+        test_data = ("\ufeff" + test_text).encode(encoding.replace("-sig", ""))
+        with tempfile.NamedTemporaryFile(mode="wb", suffix=".py", delete=False) as f:
+            f.write(test_data)
+            file_path = f.name
+        
+        try:
+            # Load the file
+            assert file_tab.load_file(file_path)
+            
+            # Check that the text is decoded without the byte order mark
+            assert file_tab.encoding == encoding
+            assert file_tab.get_text() == test_text
+            
+            # Check that saving the unchanged file writes the same bytes back
+            assert file_tab.save_file()
+            with open(file_path, "rb") as f:
+                assert f.read() == test_data
+        finally:
+            # Clean up
+            os.unlink(file_path)
+            if os.path.exists(f"{file_path}.bak"):
+                os.unlink(f"{file_path}.bak")
+    
     def test_file_tab_save_file(self, file_tab, monkeypatch):
         """Test saving a file from the file tab."""
         # Mock the QFileDialog.getSaveFileName method
@@ -144,3 +248,33 @@ class TestFileTab:
         
         # Check that the signal was emitted with the correct values
         assert blocker.args == [2, 3]
+    
+    def test_file_tab_save_file_backup(self, file_tab):
+        """Test that saving a file keeps a byte-identical backup of the previous version."""
+        # Create a temporary file with content that is not valid UTF-8
+        with tempfile.NamedTemporaryFile(mode="wb", suffix=".py", delete=False) as f:
+            original_content = b"# caf\xe9\nprint('Hello')\n"
+            f.write(original_content)
+            file_path = f.name
+        
+        backup_path = f"{file_path}.bak"
+        
+        try:
+            file_tab.file_path = file_path
+            file_tab.set_text("print('Hello, World!')\n")
+            
+            # Save the file
+            assert file_tab.save_file()
+            
+            # Check that the backup holds the previous content unchanged
+            with open(backup_path, "rb") as f:
+                assert f.read() == original_content
+            
+            # Check that the file holds the new content
+            with open(file_path, "r", encoding="utf-8") as f:
+                assert f.read() == "print('Hello, World!')\n"
+        finally:
+            # Clean up
+            os.unlink(file_path)
+            if os.path.exists(backup_path):
+                os.unlink(backup_path)
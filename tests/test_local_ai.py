@@ -120,3 +120,70 @@ class TestLocalAI:
             "max_tokens": 100,
             "temperature": 0.7
         }
+    
+    def test_local_ai_client_session(self):
+        """Test that the client sends requests through its keep-alive session."""
+        from src.ai.local_ai_client import LocalAIClient
+        
+        client = LocalAIClient()
+        client.session = MagicMock()
+        
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.content = b'{"choices": [{"text": "return n"}]}'
+        client.session.post.return_value = mock_response
+        
+        completion = client.get_completion("def identity(n):", max_tokens=10)
+        assert completion == "return n"
+        
+        # Verify that the payload was serialized to JSON bytes
+        client.session.post.assert_called_once()
+        args, kwargs = client.session.post.call_args
+        assert args[0] == "http://127.0.0.1:1234/v1/completions"
+        assert json.loads(kwargs["data"])["prompt"] == "def identity(n):"
+        assert json.loads(kwargs["data"])["max_tokens"] == 10
+    
+    def test_local_ai_client_slot_ids(self):
+        """Test that the client assigns server slots to prompt prefixes in LRU order."""
+        from src.ai.local_ai_client import LocalAIClient
+        
+        # A single slot by default, matching the server's default
+        client = LocalAIClient()
+        assert client.get_slot_id("prefix a") == 0
+        assert client.get_slot_id("prefix b") == 0
+        
+        client = LocalAIClient(max_cached_slots=2)
+        assert client.get_slot_id("prefix a") == 0
+        assert client.get_slot_id("prefix b") == 1
+        assert client.get_slot_id("prefix a") == 0
+        
+        # The least recently used prefix gives up its slot
+        assert client.get_slot_id("prefix c") == 1
+        assert client.get_slot_id("prefix a") == 0
+        assert len(client.prefix_slots) == 2
+    
+    def test_local_ai_client_compiled_segments(self):
+        """Test that the client tracks which segments the server holds."""
+        from src.ai.local_ai_client import LocalAIClient, SegmentCachingUnsupportedError
+        
+        client = LocalAIClient()
+        client.session = MagicMock()
+        
+        # Servers without segment support raise a dedicated error
+        client.session.post.return_value = MagicMock(status_code=501)
+        with pytest.raises(SegmentCachingUnsupportedError):
+            client.compile_segment("def factorial(n):")
+        assert not client.compiled_segments
+        
+        # Compiled segments are not sent again
+        client.session.post.return_value = MagicMock(status_code=200)
+        key = client.compile_segment("def factorial(n):")
+        client.compile_segment("def factorial(n):")
+        assert client.session.post.call_count == 2
+        assert key in client.compiled_segments
+        
+        # A failed completion forgets the segments it used, e.g. after a server restart
+        client.session.post.return_value = MagicMock(status_code=500)
+        with pytest.raises(Exception):
+            client.get_completion("def factorial(n):", cached_segments=[key])
+        assert key not in client.compiled_segments
@@ -131,6 +131,47 @@ class TestNaturalLanguageCodeDialog:
         # Check that the insert button is enabled
         assert dialog.insert_button.isEnabled()
     
+    @patch("src.ai.natural_language_code_generation.NaturalLanguageCodeGenerator.explain_code")
+    @patch("src.ai.natural_language_code_generation.NaturalLanguageCodeGenerator.generate_code")
+    def test_explain_generated_code(self, mock_generate, mock_explain, dialog):
+        """Test explaining code that was generated without explanation."""
+        # Mock the generate_code and explain_code methods
+        mock_generate.return_value = {
+            "success": True,
+            "code": "def factorial(n):\n    if n <= 1:\n        return 1\n    else:\n        return n * factorial(n-1)",
+            "language": "python"
+        }
+        mock_explain.return_value = {
+            "success": True,
+            "code": "def factorial(n):\n    if n <= 1:\n        return 1\n    else:\n        return n * factorial(n-1)",
+            "explanation": "This function calculates the factorial of a number using recursion.",
+            "language": "python"
+        }
+        
+        # Check that the explain button is disabled by default
+        assert not dialog.explain_button.isEnabled()
+        
+        # Generate the code without explanation
+        dialog.description_edit.setText("Create a function to calculate the factorial of a number")
+        dialog.explanation_checkbox.setChecked(False)
+        dialog._generate_code()
+        
+        assert dialog.explain_button.isEnabled()
+        
+        # Explain the generated code
+        dialog._explain_code()
+        
+        # Check that only the explanation was requested for the displayed code
+        mock_generate.assert_called_once()
+        mock_explain.assert_called_once()
+        args, kwargs = mock_explain.call_args
+        assert "def factorial(n):" in kwargs["code"]
+        assert kwargs["language"] == "python"
+        
+        # Check that the explanation is displayed
+        assert "recursion" in dialog.explanation_edit.toPlainText()
+        assert not dialog.explain_button.isEnabled()
+    
     @patch("src.ai.natural_language_code_generation.NaturalLanguageCodeGenerator.generate_code_with_explanation")
     def test_generate_code_with_context(self, mock_generate, dialog):
         """Test generating code with context."""
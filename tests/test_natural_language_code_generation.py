@@ -7,6 +7,7 @@ import json
 from unittest.mock import patch, MagicMock
 
 from src.ai.natural_language_code_generation import NaturalLanguageCodeGenerator
+from src.ai.local_ai_client import SegmentCachingUnsupportedError
 
 # Skip the test if the local AI server is not running
 def is_local_ai_server_running():
@@ -43,9 +44,11 @@ class TestNaturalLanguageCodeGenerator:
             "max_tokens": 1000,
             "temperature": 0.5,
             "top_p": 0.8,
-            "default_language": "javascript"
+            "default_language": "javascript",
+            "server_slots": 4
         }
         generator = NaturalLanguageCodeGenerator(config)
+        assert generator.client.max_cached_slots == 4
         assert generator.model_name == "test-model"
         assert generator.max_tokens == 1000
         assert generator.temperature == 0.5
@@ -184,6 +187,51 @@ This function calculates the nth Fibonacci number using recursion.
         assert result["explanation"] == ""
         assert result["language"] == "python"
     
+    @patch("src.ai.local_ai_client.LocalAIClient.get_completion")
+    @patch("src.ai.local_ai_client.LocalAIClient.is_server_running")
+    def test_explain_code(self, mock_is_server_running, mock_get_completion):
+        """Test that explain_code only generates the explanation."""
+        mock_is_server_running.return_value = True
+        mock_get_completion.return_value = """This function calculates the nth Fibonacci number using recursion.
+"""
+        
+        generator = NaturalLanguageCodeGenerator()
+        code = """def fibonacci(n):
+    if n <= 1:
+        return n
+    return fibonacci(n-1) + fibonacci(n-2)"""
+        
+        result = generator.explain_code(code, "python")
+        
+        assert result["success"] is True
+        assert result["code"] == code
+        assert result["explanation"] == "This function calculates the nth Fibonacci number using recursion."
+        assert result["language"] == "python"
+        
+        # The code is part of the prompt, which ends at the explanation header
+        prompt = mock_get_completion.call_args.kwargs["prompt"]
+        assert code in prompt
+        assert prompt.endswith("## Explanation\n")
+        assert mock_get_completion.call_args.kwargs["max_tokens"] == generator.max_tokens
+        
+        # Test when server is not available
+        mock_is_server_running.return_value = False
+        result = generator.explain_code(code, "python")
+        
+        assert result["success"] is False
+        assert result["error"] == "Natural language code generator is not available"
+        assert result["code"] == code
+        assert result["explanation"] == ""
+        
+        # Test when an exception occurs
+        mock_is_server_running.return_value = True
+        mock_get_completion.side_effect = Exception("Test exception")
+        result = generator.explain_code(code, "python")
+        
+        assert result["success"] is False
+        assert result["error"] == "Test exception"
+        assert result["explanation"] == ""
+    
     @patch("src.ai.local_ai_client.LocalAIClient.get_completion")
     @patch("src.ai.local_ai_client.LocalAIClient.is_server_running")
     def test_improve_code(self, mock_is_server_running, mock_get_completion):
@@ -236,6 +284,122 @@ def fibonacci(n):
         assert result["code"] == code
         assert result["language"] == "python"
     
+    @patch("src.ai.local_ai_client.LocalAIClient.compile_segment")
+    @patch("src.ai.local_ai_client.LocalAIClient.get_completion")
+    @patch("src.ai.local_ai_client.LocalAIClient.is_server_running")
+    def test_position_independent_caching(self, mock_is_server_running, mock_get_completion, mock_compile_segment):
+        """Test that the context is compiled and reused when position-independent caching is enabled."""
+        mock_is_server_running.return_value = True
+        mock_get_completion.return_value = "def fibonacci(n):\n    return n"
+        mock_compile_segment.return_value = "context-key"
+        context = "def factorial(n):\n    return 1"
+        
+        # Disabled by default
+        generator = NaturalLanguageCodeGenerator()
+        generator.generate_code("Create a fibonacci function", context=context)
+        mock_compile_segment.assert_not_called()
+        assert "cached_segments" not in mock_get_completion.call_args.kwargs
+        
+        generator = NaturalLanguageCodeGenerator({"position_independent_caching": True})
+        result = generator.generate_code("Create a fibonacci function", context=context)
+        
+        assert result["success"] is True
+        mock_compile_segment.assert_called_once_with(context, model=generator.model_name)
+        assert mock_get_completion.call_args.kwargs["cached_segments"] == ["context-key"]
+        
+        # Fall back to prefix caching for a request whose context fails to compile
+        mock_compile_segment.reset_mock()
+        mock_compile_segment.side_effect = [Exception("Timeout"), "context-key"]
+        generator = NaturalLanguageCodeGenerator({"position_independent_caching": True})
+        result = generator.generate_code("Create a fibonacci function", context=context)
+        
+        assert result["success"] is True
+        assert mock_get_completion.call_args.kwargs["cache_prompt"] is True
+        assert "cached_segments" not in mock_get_completion.call_args.kwargs
+        
+        # The next request tries position-independent caching again
+        generator.generate_code("Create a fibonacci function", context=context)
+        assert mock_compile_segment.call_count == 2
+        assert mock_get_completion.call_args.kwargs["cached_segments"] == ["context-key"]
+        
+        # Stop compiling segments once the server reports they are not supported
+        mock_compile_segment.reset_mock()
+        mock_compile_segment.side_effect = SegmentCachingUnsupportedError("Error: 501")
+        generator = NaturalLanguageCodeGenerator({"position_independent_caching": True})
+        generator.generate_code("Create a fibonacci function", context=context)
+        generator.generate_code("Create a fibonacci function", context=context)
+        
+        assert mock_compile_segment.call_count == 1
+        assert mock_get_completion.call_args.kwargs["cache_prompt"] is True
+        assert "cached_segments" not in mock_get_completion.call_args.kwargs
+        
+        # Context that is not part of the prompt is not compiled
+        mock_compile_segment.reset_mock(side_effect=True)
+        generator = NaturalLanguageCodeGenerator({"position_independent_caching": True})
+        result = generator.explain_code("def fibonacci(n):\n    return n", "python", context=context * 1000)
+        
+        assert result["success"] is True
+        mock_compile_segment.assert_not_called()
+        assert "cached_segments" not in mock_get_completion.call_args.kwargs
+    
+    @patch("src.ai.local_ai_client.LocalAIClient.get_completion")
+    @patch("src.ai.local_ai_client.LocalAIClient.is_server_running")
+    def test_prefix_caching(self, mock_is_server_running, mock_get_completion):
+        """Test that explaining generated code shares the prompt prefix of the generation."""
+        mock_is_server_running.return_value = True
+        mock_get_completion.return_value = "def fibonacci(n):\n    return n"
+        description = "Create a fibonacci function"
+        
+        # Disabled by default
+        generator = NaturalLanguageCodeGenerator()
+        generator.generate_code(description)
+        assert "cache_prefix" not in mock_get_completion.call_args.kwargs
+        
+        generator = NaturalLanguageCodeGenerator({"prefix_caching": True})
+        generator.generate_code(description)
+        generate_kwargs = mock_get_completion.call_args.kwargs
+        
+        generator.explain_code("def fibonacci(n):\n    return n", "python", description=description)
+        explain_kwargs = mock_get_completion.call_args.kwargs
+        
+        assert generate_kwargs["cache_prefix"] == explain_kwargs["cache_prefix"]
+        assert generate_kwargs["prompt"].startswith(generate_kwargs["cache_prefix"])
+        assert explain_kwargs["prompt"].startswith(explain_kwargs["cache_prefix"])
+        assert explain_kwargs["prompt"].endswith("## Explanation\n")
+    
+    @patch("src.ai.local_ai_client.LocalAIClient.get_completion")
+    @patch("src.ai.local_ai_client.LocalAIClient.is_server_running")
+    def test_pretokenized_prompt(self, mock_is_server_running, mock_get_completion):
+        """Test that prompts are sent as token ids when a tokenizer is configured."""
+        mock_is_server_running.return_value = True
+        mock_get_completion.return_value = "def fibonacci(n):\n    return n"
+        
+        tokenizer = MagicMock()
+        tokenizer.encode.side_effect = lambda text, add_special_tokens=True: [len(text)]
+        
+        # Disabled by default
+        generator = NaturalLanguageCodeGenerator()
+        generator.generate_code("Create a fibonacci function")
+        assert mock_get_completion.call_args.kwargs["prompt_token_ids"] is None
+        
+        with patch.object(NaturalLanguageCodeGenerator, "_load_tokenizer", return_value=tokenizer):
+            generator = NaturalLanguageCodeGenerator({"tokenizer": "test-tokenizer"})
+        
+        # The invariant prefixes are tokenized up front
+        assert "Write Python code that" in generator._prefix_ids
+        calls_after_init = tokenizer.encode.call_count
+        
+        generator.generate_code("Create a fibonacci function")
+        generator.generate_code("Create a factorial function")
+        
+        # Only the mutable tail of each prompt is tokenized per request
+        assert tokenizer.encode.call_count == calls_after_init + 2
+        prompt = mock_get_completion.call_args.kwargs["prompt"]
+        assert mock_get_completion.call_args.kwargs["prompt_token_ids"] == [
+            len("Write Python code that"),
+            len(prompt) - len("Write Python code that")
+        ]
+    
     def test_clean_generated_code(self):
         """Test that _clean_generated_code returns the correct value."""
         generator = NaturalLanguageCodeGenerator()
@@ -291,7 +455,8 @@ This function calculates the nth Fibonacci number using recursion.
         
         code, explanation = generator._parse_code_and_explanation(response, "python")
         assert "def fibonacci(n):" in code
-        assert "recursion" in explanation
+        assert "```" not in code
+        assert explanation.startswith("This function calculates")
         
         # Test with markdown code block but no explanation
         response = """```python
@@ -408,6 +573,18 @@ int main() {
         language = generator._infer_language(code)
         assert language == "c++"
         
+        # Test C++ with main beyond the inspected prefix
+        code = "#include <iostream>\n" + "// padding\n" * 200 + "int main() {\n    return 0;\n}\n"
+        
+        language = generator._infer_language(code)
+        assert language == "c++"
+        
+        # Test that the language detected in the inspected prefix takes precedence
+        code = "function main() {\n}\n" + "// padding\n" * 200 + "def fibonacci(n):\n    return n\n"
+        
+        language = generator._infer_language(code)
+        assert language == "javascript"
+        
         # Test Rust
         code = """fn fibonacci(n: u32) -> u32 {
     if n <= 0 {